@@ -0,0 +1,103 @@
+"""
+Memory footprint of a parsed Document, in bytes per KB of Markdown source.
+
+    python benchmarks/bench_memory.py [--size-kb N]
+
+The source string itself is not counted: only what parse_markdown keeps
+alive on top of it.
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from ctk_markdown.document import parse_markdown  # noqa: E402
+
+
+def _prose(i):
+    return (f"Paragraph {i} with some **bold** text, a bit of *emphasis*, "
+            f"`inline code` and a [link](https://example.com/{i}).\n\n")
+
+
+def _lists(i):
+    return (f"- Item {i} with **bold**\n"
+            f"  - Nested item {i}\n"
+            f"- [x] Done task {i}\n"
+            f"- [ ] Pending task {i}\n"
+            f"{i % 9 + 1}. Ordered item *{i}*\n")
+
+
+def _code(i):
+    return (f"```python\n"
+            f"def function_{i}(a, b):\n"
+            f"    # add things\n"
+            f"    return a + b * {i}\n"
+            f"```\n\n")
+
+
+def _tables(i):
+    return (f"| Name | Value | Notes |\n"
+            f"|------|-------|-------|\n"
+            f"| row{i} | {i} | first |\n"
+            f"| row{i + 1} | {i + 1} | second |\n\n")
+
+
+def _mixed(i):
+    return (f"## Section {i}\n\n"
+            f"> Quote {i} with *style*\n> continued\n\n"
+            + _prose(i) + _lists(i) + _code(i) + _tables(i) + "---\n")
+
+
+CORPORA = {
+    'prose': _prose,
+    'lists': _lists,
+    'code': _code,
+    'tables': _tables,
+    'mixed': _mixed,
+}
+
+
+def build_corpus(make_chunk, size_kb: int) -> str:
+    chunks = []
+    total = 0
+    i = 0
+    while total < size_kb * 1024:
+        chunk = make_chunk(i)
+        chunks.append(chunk)
+        total += len(chunk)
+        i += 1
+    return ''.join(chunks)
+
+
+def measure(source: str):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    doc = parse_markdown(source)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return doc, retained - before, peak - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-kb', type=int, default=512, help='size of each corpus in KB')
+    args = parser.parse_args()
+
+    print(f"{'corpus':<8} {'source KB':>10} {'blocks':>8} {'spans':>8} "
+          f"{'retained':>12} {'peak':>12} {'B/source KB':>12}")
+    for name, make_chunk in CORPORA.items():
+        source = build_corpus(make_chunk, args.size_kb)
+        doc, retained, peak = measure(source)
+        source_kb = len(source.encode('utf-8')) / 1024
+        print(f"{name:<8} {source_kb:>10.1f} {len(doc):>8} {len(doc.span_tags):>8} "
+              f"{retained:>12,} {peak:>12,} {retained / source_kb:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
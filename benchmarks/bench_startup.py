@@ -0,0 +1,92 @@
+"""
+Startup cost: import time of the package modules and CTkMarkdown construction time.
+
+    python benchmarks/bench_startup.py [--repeat N] [--widgets N]
+
+Imports are timed in fresh interpreters. Widget construction needs a display
+and is skipped when Tk cannot open one.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC)
+
+IMPORTS = {
+    'ctk_markdown': 'import ctk_markdown',
+    'ctk_markdown.document': 'import ctk_markdown.document',
+    'ctk_markdown.lexers': 'import ctk_markdown.lexers',
+    'CTkMarkdown': 'from ctk_markdown import CTkMarkdown',
+}
+
+_IMPORT_SCRIPT = """
+import sys, time
+t = time.perf_counter()
+{statement}
+print(time.perf_counter() - t, 'customtkinter' in sys.modules)
+"""
+
+
+def time_import(statement: str, repeat: int):
+    env = dict(os.environ, PYTHONPATH=SRC + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    samples = []
+    loads_ctk = False
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT.format(statement=statement)],
+                             env=env, check=True, capture_output=True, text=True).stdout.split()
+        samples.append(float(out[0]))
+        loads_ctk = out[1] == 'True'
+    return statistics.median(samples), loads_ctk
+
+
+def time_construction(count: int):
+    import tkinter as tk
+    try:
+        import customtkinter as ctk
+        root = ctk.CTk()
+    except (ImportError, tk.TclError) as e:
+        print(f"  skipped: {e}")
+        return
+    from ctk_markdown import CTkMarkdown
+    sample = "# Title\n\nSome **bold** text and `code`.\n\n- item\n- [x] task\n\n```python\nx = 1\n```\n"
+
+    def run(label, make):
+        start = time.perf_counter()
+        widgets = [make() for _ in range(count)]
+        built = time.perf_counter() - start
+        for widget in widgets:
+            widget.pack()
+        root.update()
+        shown = time.perf_counter() - start
+        print(f"  {label:<22} construct {built / count * 1000:7.2f} ms/widget   "
+              f"until mapped {shown / count * 1000:7.2f} ms/widget")
+        for widget in widgets:
+            widget.destroy()
+
+    run('empty', lambda: CTkMarkdown(root))
+    run('with markdown', lambda: CTkMarkdown(root, markdown_text=sample))
+    root.destroy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per import')
+    parser.add_argument('--widgets', type=int, default=50, help='widgets built per construction run')
+    args = parser.parse_args()
+
+    print("import (median of fresh interpreters)")
+    for label, statement in IMPORTS.items():
+        seconds, loads_ctk = time_import(statement, args.repeat)
+        print(f"  {label:<22} {seconds * 1000:8.2f} ms   customtkinter loaded: {loads_ctk}")
+
+    print(f"construction ({args.widgets} widgets)")
+    time_construction(args.widgets)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,16 @@
-from .ctk_markdown import CTkMarkdown
+from .document import Document, parse_markdown
 
 __version__ = "0.1.1"
+
+
+def __getattr__(name):
+    # The widget pulls in customtkinter, so it is only imported on first use;
+    # the parser, lexers and image helpers stay importable without it.
+    if name == "CTkMarkdown":
+        from .ctk_markdown import CTkMarkdown
+        globals()["CTkMarkdown"] = CTkMarkdown
+        return CTkMarkdown
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["CTkMarkdown", "Document", "parse_markdown"]
@@ -3,34 +3,167 @@ Tkinter component for Markdown rendering.
 Uses ctk.CTkTextbox with custom tags for better control and rendering.
 """
 
+import os
 import tkinter as tk
 import tkinter.font as tkfont
+from concurrent.futures import ThreadPoolExecutor
 import customtkinter as ctk
-import re
+
+from . import lexers
+from .document import (
+    BULLET, CODE, HEADING, HIDDEN_JOIN, HR, ORDERED, PARAGRAPH, QUOTE, QUOTE_CONT,
+    SPAN_IMAGE, SPAN_TAG_NAMES, TABLE, TASK, parse_markdown,
+)
+from .images import HAVE_PIL, ImageCache, decode_image, fit_size, read_image_header
+from .sourcemap import SourceMap
+
+
+# Tcl 8 counts text index columns in UTF-16 code units, so characters outside
+# the BMP (most emoji) take two columns
+_UTF16_COLUMNS = tk.TkVersion < 9.0
+
+
+def _column_width(text: str) -> int:
+    """Number of text index columns taken by ``text``."""
+    if _UTF16_COLUMNS and not text.isascii():
+        return len(text.encode('utf-16-le')) // 2
+    return len(text)
+
 
 class CTkMarkdown(ctk.CTkTextbox):
     """CTkTextbox widget with Markdown rendering."""
     
     # Keywords for syntax highlighting
-    PYTHON_KEYWORDS = {
-        'False', 'None', 'True', 'and', 'as', 'assert', 'async', 'await',
-        'break', 'class', 'continue', 'def', 'del', 'elif', 'else', 'except',
-        'finally', 'for', 'from', 'global', 'if', 'import', 'in', 'is',
-        'lambda', 'nonlocal', 'not', 'or', 'pass', 'raise', 'return', 'try',
-        'while', 'with', 'yield', 'print', 'len', 'range', 'str', 'int',
-        'float', 'list', 'dict', 'set', 'tuple', 'open', 'input', 'type'
+    PYTHON_KEYWORDS = lexers.PYTHON_KEYWORDS
+    JS_KEYWORDS = lexers.JS_KEYWORDS
+
+    # Colors for the light and dark appearance modes
+    THEME_COLORS = {
+        'light': {
+            'heading_1': '#1a1a2e',
+            'heading_2': '#16213e',
+            'heading_3': '#1f4068',
+            'heading_4': '#1b1b2f',
+            'heading_5': '#464866',
+            'heading_6': '#6b778d',
+            'muted': '#6c757d',
+            'link': '#0d6efd',
+            'code_inline_fg': '#d63384',
+            'code_inline_bg': '#f6f8fa',
+            'code_block_fg': '#1f2328',
+            'code_block_bg': "#EEEEEE",
+            'code_keyword': '#0550ae',
+            'code_string': '#0a3069',
+            'code_comment': '#6e7781',
+            'code_number': '#953800',
+            'code_function': '#8250df',
+            'code_class': '#1f6feb',
+            'code_decorator': '#a371f7',
+            'code_operator': '#24292f',
+            'blockquote_fg': '#6c757d',
+            'blockquote_bg': '#f8f9fa',
+            'list_bullet': '#6c757d',
+            'list_number': '#0d6efd',
+            'hr': '#dee2e6',
+            'table_border': '#6c757d',
+            'table_header_bg': '#e9ecef',
+            'table_header_fg': '#212529',
+            'table_cell_bg': '#ffffff',
+            'table_cell_fg': '#212529',
+            'table_row_alt_bg': '#f8f9fa',
+            'checkbox_done': '#198754',
+            'checkbox_pending': '#dc3545'
+        },
+        'dark': {
+            'heading_1': '#e6edf3',
+            'heading_2': '#d1d9e0',
+            'heading_3': '#b6c2cf',
+            'heading_4': '#9fb0c2',
+            'heading_5': '#8b9bb0',
+            'heading_6': '#778899',
+            'muted': '#9aa0a6',
+            'link': '#4da3ff',
+            'code_inline_fg': '#ff7aa8',
+            'code_inline_bg': '#2b2b2b',
+            'code_block_fg': '#f0f6fc',
+            'code_block_bg': "#212121",
+            'code_keyword': '#569cd6',
+            'code_string': '#ce9178',
+            'code_comment': '#6a9955',
+            'code_number': '#b5cea8',
+            'code_function': '#dcdcaa',
+            'code_class': '#4ec9b0',
+            'code_decorator': '#c586c0',
+            'code_operator': '#d4d4d4',
+            'blockquote_fg': '#9aa0a6',
+            'blockquote_bg': '#20242a',
+            'list_bullet': '#9aa0a6',
+            'list_number': '#4da3ff',
+            'hr': '#30363d',
+            'table_border': '#4b5563',
+            'table_header_bg': '#30363d',
+            'table_header_fg': '#e6edf3',
+            'table_cell_bg': '#0d1117',
+            'table_cell_fg': '#c9d1d9',
+            'table_row_alt_bg': '#161b22',
+            'checkbox_done': '#3fb950',
+            'checkbox_pending': '#ff7b72'
+        }
     }
-    
-    JS_KEYWORDS = {
-        'async', 'await', 'break', 'case', 'catch', 'class', 'const', 'continue',
-        'debugger', 'default', 'delete', 'do', 'else', 'export', 'extends',
-        'finally', 'for', 'function', 'if', 'import', 'in', 'instanceof',
-        'let', 'new', 'return', 'static', 'super', 'switch', 'this', 'throw',
-        'try', 'typeof', 'var', 'void', 'while', 'with', 'yield', 'console',
-        'log', 'true', 'false', 'null', 'undefined'
+
+    # Theme color keys applied to each tag: {tag: {tag option: color key}}
+    TAG_COLORS = {
+        'h1': {'foreground': 'heading_1'},
+        'h2': {'foreground': 'heading_2'},
+        'h3': {'foreground': 'heading_3'},
+        'h4': {'foreground': 'heading_4'},
+        'h5': {'foreground': 'heading_5'},
+        'h6': {'foreground': 'heading_6'},
+        'strikethrough': {'foreground': 'muted'},
+        'code_inline': {'foreground': 'code_inline_fg', 'background': 'code_inline_bg'},
+        'code_block': {'foreground': 'code_block_fg', 'background': 'code_block_bg'},
+        'code_keyword': {'foreground': 'code_keyword'},
+        'code_string': {'foreground': 'code_string'},
+        'code_comment': {'foreground': 'code_comment'},
+        'code_number': {'foreground': 'code_number'},
+        'code_function': {'foreground': 'code_function'},
+        'code_class': {'foreground': 'code_class'},
+        'code_decorator': {'foreground': 'code_decorator'},
+        'code_operator': {'foreground': 'code_operator'},
+        'blockquote': {'foreground': 'blockquote_fg', 'background': 'blockquote_bg'},
+        'link': {'foreground': 'link'},
+        'list_bullet': {'foreground': 'list_bullet'},
+        'list_number': {'foreground': 'list_number'},
+        'hr': {'foreground': 'hr'},
+        'table_border': {'foreground': 'table_border'},
+        'table_header': {'background': 'table_header_bg', 'foreground': 'table_header_fg'},
+        'table_cell': {'background': 'table_cell_bg', 'foreground': 'table_cell_fg'},
+        'table_row_alt': {'background': 'table_row_alt_bg', 'foreground': 'table_cell_fg'},
+        'checkbox_done': {'foreground': 'checkbox_done'},
+        'checkbox_pending': {'foreground': 'checkbox_pending'},
+    }
+
+    # Tags needed by each block kind; only the ones a document uses get configured
+    BLOCK_TAGS = {
+        HR: ('hr',),
+        HEADING: ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'),
+        QUOTE: ('blockquote',),
+        BULLET: ('list_bullet', 'list_item'),
+        TASK: ('checkbox_done', 'checkbox_pending', 'list_item'),
+        ORDERED: ('list_number', 'list_item'),
+        CODE: ('code_block',) + lexers.TOKEN_TAGS,
     }
+
+    # Decoded images shared by every instance, bounded by size in bytes
+    image_cache = ImageCache(64 * 1024 * 1024)
+    _image_executor = None
+
+    # Images this many lines above/below the viewport are decoded ahead of time
+    IMAGE_PREFETCH_LINES = 40
+    IMAGE_DEFAULT_WIDTH = 640
+    IMAGE_POLL_MS = 30
     
-    def __init__(self, master, markdown_text="", **kwargs):
+    def __init__(self, master, markdown_text="", base_dir=None, **kwargs):
         defaults = {
             "cursor": "arrow",
             "wrap": "word"
@@ -42,489 +175,520 @@ class CTkMarkdown(ctk.CTkTextbox):
         if 'yscrollcommand' in kwargs: kwargs.pop('yscrollcommand')
         defaults.update(kwargs) 
         super().__init__(master, **defaults)
-        self._setup_tags()
+        self.base_dir = base_dir
+        self._document = None
+        self._source_map = SourceMap()
+        # Position of the next appended character, tracked while rendering
+        self._text_line = 1
+        self._text_column = 0
+        # Tags are configured lazily: on first render once the widget is mapped
+        self._base_font = None
+        self._mapped = False
+        self._tags_wanted = set()
+        self._tags_configured = set()
+        self._images = {}          # image name -> PhotoImage shown in the text
+        self._placeholders = {}    # (width, height) -> blank PhotoImage
+        self._pending_images = {}  # image name -> decode request
+        self._image_jobs = {}      # image name -> Future
+        self._image_counter = 0
+        self._image_fit_width = None  # max width the pending placeholders were sized for
+        self._image_check_id = None
+        self._image_poll_id = None
+        self._textbox.configure(yscrollcommand=self._on_yscroll)
+        self._textbox.bind('<Configure>', self._on_configure, add=True)
+        self._textbox.bind('<Map>', self._on_map, add=True)
         try:
             ctk.AppearanceModeTracker.add(self._apply_theme, self)
         except Exception:
             pass
-        self._render_markdown(markdown_text)
-    
-    def _setup_tags(self):
-        """Configure formatting tags."""
-        # Fonts
-        base_font = tkfont.Font(font=self._textbox.cget('font'))
-        base_size = int(base_font.cget('size'))
-        base_family = base_font.cget('family')
-        
-        self._theme_colors = {
-            'light': {
-                'heading_1': '#1a1a2e',
-                'heading_2': '#16213e',
-                'heading_3': '#1f4068',
-                'heading_4': '#1b1b2f',
-                'heading_5': '#464866',
-                'heading_6': '#6b778d',
-                'muted': '#6c757d',
-                'link': '#0d6efd',
-                'code_inline_fg': '#d63384',
-                'code_inline_bg': '#f6f8fa',
-                'code_block_fg': '#1f2328',
-                'code_block_bg': "#EEEEEE",
-                'code_keyword': '#0550ae',
-                'code_string': '#0a3069',
-                'code_comment': '#6e7781',
-                'code_number': '#953800',
-                'code_function': '#8250df',
-                'code_class': '#1f6feb',
-                'code_decorator': '#a371f7',
-                'code_operator': '#24292f',
-                'blockquote_fg': '#6c757d',
-                'blockquote_bg': '#f8f9fa',
-                'list_bullet': '#6c757d',
-                'list_number': '#0d6efd',
-                'hr': '#dee2e6',
-                'table_border': '#6c757d',
-                'table_header_bg': '#e9ecef',
-                'table_header_fg': '#212529',
-                'table_cell_bg': '#ffffff',
-                'table_cell_fg': '#212529',
-                'table_row_alt_bg': '#f8f9fa',
-                'checkbox_done': '#198754',
-                'checkbox_pending': '#dc3545'
-            },
-            'dark': {
-                'heading_1': '#e6edf3',
-                'heading_2': '#d1d9e0',
-                'heading_3': '#b6c2cf',
-                'heading_4': '#9fb0c2',
-                'heading_5': '#8b9bb0',
-                'heading_6': '#778899',
-                'muted': '#9aa0a6',
-                'link': '#4da3ff',
-                'code_inline_fg': '#ff7aa8',
-                'code_inline_bg': '#2b2b2b',
-                'code_block_fg': '#f0f6fc',
-                'code_block_bg': "#212121",
-                'code_keyword': '#569cd6',
-                'code_string': '#ce9178',
-                'code_comment': '#6a9955',
-                'code_number': '#b5cea8',
-                'code_function': '#dcdcaa',
-                'code_class': '#4ec9b0',
-                'code_decorator': '#c586c0',
-                'code_operator': '#d4d4d4',
-                'blockquote_fg': '#9aa0a6',
-                'blockquote_bg': '#20242a',
-                'list_bullet': '#9aa0a6',
-                'list_number': '#4da3ff',
-                'hr': '#30363d',
-                'table_border': '#4b5563',
-                'table_header_bg': '#30363d',
-                'table_header_fg': '#e6edf3',
-                'table_cell_bg': '#0d1117',
-                'table_cell_fg': '#c9d1d9',
-                'table_row_alt_bg': '#161b22',
-                'checkbox_done': '#3fb950',
-                'checkbox_pending': '#ff7b72'
-            }
-        }
-        
-        # Headings
-        self._textbox.tag_config('h1', font=('Segoe UI', base_size + 12, 'bold'),
-                          spacing1=20, spacing3=10)
-        self._textbox.tag_config('h2', font=('Segoe UI', base_size + 8, 'bold'),
-                          spacing1=18, spacing3=8)
-        self._textbox.tag_config('h3', font=('Segoe UI', base_size + 5, 'bold'),
-                          spacing1=15, spacing3=6)
-        self._textbox.tag_config('h4', font=('Segoe UI', base_size + 3, 'bold'),
-                          spacing1=12, spacing3=5)
-        self._textbox.tag_config('h5', font=('Segoe UI', base_size + 2, 'bold'),
-                          spacing1=10, spacing3=4)
-        self._textbox.tag_config('h6', font=('Segoe UI', base_size + 1, 'bold'),
-                          spacing1=8, spacing3=3)
-        
-        # Text formatting
-        self._textbox.tag_config('bold', font=(base_family, base_size, 'bold'))
-        self._textbox.tag_config('italic', font=(base_family, base_size, 'italic'))
-        self._textbox.tag_config('bold_italic', font=(base_family, base_size, 'bold italic'))
-        self._textbox.tag_config('strikethrough', overstrike=True)
-        self._textbox.tag_config('underline', underline=True)
-        
-        # Inline code
-        self._textbox.tag_config('code_inline', 
-              font=('Consolas', base_size),
-                  spacing1=2)
-        
-        # Code block
-        self._textbox.tag_config('code_block', 
-              font=('Consolas', base_size),
-                  spacing1=10,
-                  spacing3=10,
-                  lmargin1=20,
-                  lmargin2=20,
-                  rmargin=20)
-        
-        # Syntax highlighting for code
-        self._textbox.tag_config('code_keyword', font=('Consolas', base_size - 1))
-        self._textbox.tag_config('code_string', font=('Consolas', base_size - 1))
-        self._textbox.tag_config('code_comment', font=('Consolas', base_size - 1))
-        self._textbox.tag_config('code_number', font=('Consolas', base_size - 1))
-        self._textbox.tag_config('code_function', font=('Consolas', base_size - 1))
-        self._textbox.tag_config('code_class', font=('Consolas', base_size - 1))
-        self._textbox.tag_config('code_decorator', font=('Consolas', base_size - 1))
-        self._textbox.tag_config('code_operator', font=('Consolas', base_size - 1))
-        
-        # Blockquote
-        self._textbox.tag_config('blockquote', 
-                  font=('Segoe UI', base_size, 'italic'),
-                  lmargin1=30,
-                  lmargin2=30,
-                  spacing1=8,
-                  spacing3=8,
-                  borderwidth=3)
-        
-        # Links
-        self._textbox.tag_config('link', underline=True)
-        self._textbox.tag_bind('link', '<Enter>', lambda e: self.configure(cursor='hand2'))
-        self._textbox.tag_bind('link', '<Leave>', lambda e: self.configure(cursor='arrow'))
-        
-        # Lists
-        self._textbox.tag_config('list_item', lmargin1=25, lmargin2=40)
-        self._textbox.tag_config('list_bullet')
-        self._textbox.tag_config('list_number', font=('Segoe UI', base_size, 'bold'))
-        
-        # Horizontal rule
-        self._textbox.tag_config('hr', font=('Segoe UI', 4),
-                  spacing1=15, spacing3=15, justify='center')
-        
-        # Table
-        self._textbox.tag_config('table_border', font=('Consolas', base_size))
-        self._textbox.tag_config('table_header', font=('Consolas', base_size, 'bold'))
-        self._textbox.tag_config('table_cell', font=('Consolas', base_size))
-        self._textbox.tag_config('table_row_alt', font=('Consolas', base_size))
-        
-        # Checkbox
-        self._textbox.tag_config('checkbox_done')
-        self._textbox.tag_config('checkbox_pending')
+        if markdown_text:
+            self._render_markdown(markdown_text)
+        else:
+            self.configure(state='disabled')
 
-        self._apply_theme()
+    def _on_map(self, event=None):
+        self._mapped = True
+        self._setup_tags()
+        self._refit_pending_images()
+
+    def _on_configure(self, event=None):
+        self._refit_pending_images()
+        self._schedule_image_check()
+
+    def _require_tags(self, names):
+        """Mark tags as used; they are configured now if the widget is visible."""
+        self._tags_wanted.update(names)
+        if self._mapped:
+            self._setup_tags()
+
+    def _tag_styles(self) -> dict:
+        """Static options of every tag, in priority order (lowest first)."""
+        if self._base_font is None:
+            base_font = tkfont.Font(font=self._textbox.cget('font'))
+            self._base_font = (int(base_font.cget('size')), base_font.cget('family'))
+        base_size, base_family = self._base_font
+        code_token = {'font': ('Consolas', base_size - 1)}
+
+        return {
+            # Headings
+            'h1': {'font': ('Segoe UI', base_size + 12, 'bold'), 'spacing1': 20, 'spacing3': 10},
+            'h2': {'font': ('Segoe UI', base_size + 8, 'bold'), 'spacing1': 18, 'spacing3': 8},
+            'h3': {'font': ('Segoe UI', base_size + 5, 'bold'), 'spacing1': 15, 'spacing3': 6},
+            'h4': {'font': ('Segoe UI', base_size + 3, 'bold'), 'spacing1': 12, 'spacing3': 5},
+            'h5': {'font': ('Segoe UI', base_size + 2, 'bold'), 'spacing1': 10, 'spacing3': 4},
+            'h6': {'font': ('Segoe UI', base_size + 1, 'bold'), 'spacing1': 8, 'spacing3': 3},
+
+            # Text formatting
+            'bold': {'font': (base_family, base_size, 'bold')},
+            'italic': {'font': (base_family, base_size, 'italic')},
+            'bold_italic': {'font': (base_family, base_size, 'bold italic')},
+            'strikethrough': {'overstrike': True},
+            'underline': {'underline': True},
+
+            # Inline code
+            'code_inline': {'font': ('Consolas', base_size), 'spacing1': 2},
 
-    def _get_mode(self, mode=None):
-        if mode is None:
-            mode = ctk.get_appearance_mode()
-        return 'dark' if str(mode).lower().startswith('dark') else 'light'
+            # Code block
+            'code_block': {'font': ('Consolas', base_size), 'spacing1': 10, 'spacing3': 10,
+                           'lmargin1': 20, 'lmargin2': 20, 'rmargin': 20},
+
+            # Syntax highlighting for code
+            'code_keyword': code_token,
+            'code_string': code_token,
+            'code_comment': code_token,
+            'code_number': code_token,
+            'code_function': code_token,
+            'code_class': code_token,
+            'code_decorator': code_token,
+            'code_operator': code_token,
 
-    def _apply_theme(self, mode=None):
-        mode = self._get_mode(mode)
-        colors = self._theme_colors[mode]
-        tb = self._textbox
+            # Blockquote
+            'blockquote': {'font': ('Segoe UI', base_size, 'italic'), 'lmargin1': 30, 'lmargin2': 30,
+                           'spacing1': 8, 'spacing3': 8, 'borderwidth': 3},
 
-        tb.tag_config('h1', foreground=colors['heading_1'])
-        tb.tag_config('h2', foreground=colors['heading_2'])
-        tb.tag_config('h3', foreground=colors['heading_3'])
-        tb.tag_config('h4', foreground=colors['heading_4'])
-        tb.tag_config('h5', foreground=colors['heading_5'])
-        tb.tag_config('h6', foreground=colors['heading_6'])
+            # Links
+            'link': {'underline': True},
 
-        tb.tag_config('strikethrough', foreground=colors['muted'])
-        tb.tag_config('code_inline', foreground=colors['code_inline_fg'], background=colors['code_inline_bg'])
-        tb.tag_config('code_block', foreground=colors['code_block_fg'], background=colors['code_block_bg'])
+            # Lists
+            'list_item': {'lmargin1': 25, 'lmargin2': 40},
+            'list_bullet': {},
+            'list_number': {'font': ('Segoe UI', base_size, 'bold')},
 
-        tb.tag_config('code_keyword', foreground=colors['code_keyword'])
-        tb.tag_config('code_string', foreground=colors['code_string'])
-        tb.tag_config('code_comment', foreground=colors['code_comment'])
-        tb.tag_config('code_number', foreground=colors['code_number'])
-        tb.tag_config('code_function', foreground=colors['code_function'])
-        tb.tag_config('code_class', foreground=colors['code_class'])
-        tb.tag_config('code_decorator', foreground=colors['code_decorator'])
-        tb.tag_config('code_operator', foreground=colors['code_operator'])
+            # Horizontal rule
+            'hr': {'font': ('Segoe UI', 4), 'spacing1': 15, 'spacing3': 15, 'justify': 'center'},
 
-        tb.tag_config('blockquote', foreground=colors['blockquote_fg'], background=colors['blockquote_bg'])
-        tb.tag_config('link', foreground=colors['link'])
+            # Table
+            'table_border': {'font': ('Consolas', base_size)},
+            'table_header': {'font': ('Consolas', base_size, 'bold')},
+            'table_cell': {'font': ('Consolas', base_size)},
+            'table_row_alt': {'font': ('Consolas', base_size)},
+
+            # Checkbox
+            'checkbox_done': {},
+            'checkbox_pending': {},
+        }
 
-        tb.tag_config('list_bullet', foreground=colors['list_bullet'])
-        tb.tag_config('list_number', foreground=colors['list_number'])
+    def _setup_tags(self):
+        """Configure the wanted formatting tags that are not configured yet."""
+        new_tags = self._tags_wanted - self._tags_configured
+        if not new_tags:
+            return
+        tb = self._textbox
+        styles = self._tag_styles()
+        for name in new_tags:
+            tb.tag_config(name, **styles[name])
+        if 'link' in new_tags:
+            tb.tag_bind('link', '<Enter>', lambda e: self.configure(cursor='hand2'))
+            tb.tag_bind('link', '<Leave>', lambda e: self.configure(cursor='arrow'))
+        self._tags_configured |= new_tags
+        self._apply_theme(tags=new_tags)
+
+        # Tags are created in document order; restore the fixed priority order
+        for name in styles:
+            if name in self._tags_configured:
+                tb.tag_raise(name)
 
-        tb.tag_config('hr', foreground=colors['hr'])
+    def _get_mode(self, mode=None):
+        if mode is None:
+            mode = ctk.get_appearance_mode()
+        return 'dark' if str(mode).lower().startswith('dark') else 'light'
 
-        tb.tag_config('table_border', foreground=colors['table_border'])
-        tb.tag_config('table_header', background=colors['table_header_bg'], foreground=colors['table_header_fg'])
-        tb.tag_config('table_cell', background=colors['table_cell_bg'], foreground=colors['table_cell_fg'])
-        tb.tag_config('table_row_alt', background=colors['table_row_alt_bg'], foreground=colors['table_cell_fg'])
+    def _apply_theme(self, mode=None, tags=None):
+        mode = self._get_mode(mode)
+        colors = self.THEME_COLORS[mode]
+        tb = self._textbox
 
-        tb.tag_config('checkbox_done', foreground=colors['checkbox_done'])
-        tb.tag_config('checkbox_pending', foreground=colors['checkbox_pending'])
+        for name in self._tags_configured if tags is None else tags:
+            options = self.TAG_COLORS.get(name)
+            if options:
+                tb.tag_config(name, **{option: colors[key] for option, key in options.items()})
 
     
     def set_markdown(self, markdown_text: str):
         """Set the Markdown text to be rendered."""
         self._render_markdown(markdown_text)
     
+    def destroy(self):
+        self._cancel_image_jobs()
+        if self._image_check_id is not None:
+            self.after_cancel(self._image_check_id)
+            self._image_check_id = None
+        super().destroy()
+
     def _render_markdown(self, text: str):
         """Process and render Markdown."""
         self.configure(state='normal')
         self.delete("0.0", "end")
-        
-        lines = text.split('\n')
-        i = 0
-        in_code_block = False
-        code_block_content = []
-        code_language = ""
-        
-        while i < len(lines):
-            line = lines[i]
-            
-            # Code block
-            if line.strip().startswith('```'):
-                if not in_code_block:
-                    in_code_block = True
-                    code_language = line.strip()[3:].strip().lower()
-                    code_block_content = []
-                else:
-                    in_code_block = False
-                    self._insert_code_block('\n'.join(code_block_content), code_language)
-                    code_block_content = []
-                    code_language = ""
-                i += 1
+        self._cancel_image_jobs()
+        self._images.clear()
+
+        self._document = doc = parse_markdown(text)
+        self._source_map = SourceMap()
+        self._text_line = 1
+        self._text_column = 0
+        kinds = doc.kinds
+        count = len(doc)
+        self._require_tags(self._document_tags(doc))
+
+        for i in range(count):
+            kind = kinds[i]
+            self._map_source(doc.line_starts[doc.lines[i]])
+
+            if kind == CODE:
+                self._insert_code_block(doc.block_text(i), doc.block_aux(i).lower(), doc.starts[i])
+
+            elif kind == HR:
+                self._append('─' * 60 + '\n', 'hr')
+
+            elif kind == HEADING:
+                self._insert_spans(i, f'h{doc.levels[i]}')
+                self._append('\n')
+
+            elif kind == QUOTE or kind == QUOTE_CONT:
+                # Quoted lines are joined into a single paragraph
+                if kind == QUOTE:
+                    self._append('┃ ', 'blockquote')
+                elif doc.levels[i] != HIDDEN_JOIN:
+                    tag_name = SPAN_TAG_NAMES[doc.levels[i]]
+                    self._append(' ', (tag_name, 'blockquote') if tag_name else 'blockquote')
+                self._insert_spans(i, 'blockquote')
+                if i + 1 >= count or kinds[i + 1] != QUOTE_CONT:
+                    self._append('      ', 'blockquote')
+                    self._append('\n\n')
+
+            elif kind == BULLET:
+                self._append('  ' * doc.levels[i] + '• ', 'list_bullet')
+                self._insert_spans(i, 'list_item')
+                self._append('\n')
+
+            elif kind == TASK:
+                checked = doc.block_aux(i).lower() == 'x'
+                checkbox = '☑' if checked else '☐'
+                tag = 'checkbox_done' if checked else 'checkbox_pending'
+                self._append('  ' * doc.levels[i] + checkbox + ' ', tag)
+                self._insert_spans(i, 'list_item')
+                self._append('\n')
+
+            elif kind == ORDERED:
+                self._append('  ' * doc.levels[i] + f'{doc.block_aux(i)}. ', 'list_number')
+                self._insert_spans(i, 'list_item')
+                self._append('\n')
+
+            elif kind == TABLE:
+                self._insert_table(doc.block_text(i).split('\n'))
+
+            elif kind == PARAGRAPH:
+                self._insert_spans(i)
+                self._append('\n')
+
+            else:
+                self._append('\n')
+
+        self.configure(state='disabled')
+    
+    def _document_tags(self, doc) -> set:
+        """Names of the tags a document will use."""
+        tags = set()
+        for kind in set(doc.kinds):
+            tags.update(self.BLOCK_TAGS.get(kind, ()))
+        for span_tag in set(doc.span_tags):
+            if span_tag == SPAN_IMAGE:
+                tags.add('italic')  # alt text fallback
+            elif SPAN_TAG_NAMES[span_tag]:
+                tags.add(SPAN_TAG_NAMES[span_tag])
+        return tags
+
+    def _insert_spans(self, block: int, base_tag: str = None):
+        """Insert the inline spans of a block with their formatting."""
+        doc = self._document
+        source = doc.source
+        for j in doc.block_spans(block):
+            self._map_source(doc.span_starts[j], doc.span_ends[j])
+            span_tag = doc.span_tags[j]
+            content = source[doc.span_starts[j]:doc.span_ends[j]]
+            if span_tag == SPAN_IMAGE:
+                url = source[doc.span_aux_starts[j]:doc.span_aux_ends[j]]
+                self._insert_image(content, url, base_tag)
                 continue
-            
-            if in_code_block:
-                code_block_content.append(line)
-                i += 1
+            # Link targets (span_aux_starts/ends) can be used to open links
+            tag_name = SPAN_TAG_NAMES[span_tag]
+            if tag_name:
+                tags = (tag_name, base_tag) if base_tag else (tag_name,)
+                self._append(content, tags)
+            elif base_tag:
+                self._append(content, base_tag)
+            else:
+                self._append(content)
+
+    def _append(self, text: str, tags=None):
+        """Insert at the end while tracking the text position, so anchors need no Tk query."""
+        if tags is None:
+            self.insert(tk.END, text)
+        else:
+            self.insert(tk.END, text, tags)
+        newlines = text.count('\n')
+        if newlines:
+            self._text_line += newlines
+            self._text_column = _column_width(text[text.rindex('\n') + 1:])
+        else:
+            self._text_column += _column_width(text)
+
+    def _map_source(self, offset: int, end: int = None):
+        """Record that the next appended text shows source[offset:end] verbatim."""
+        if end is None:
+            self._source_map.add(self._text_line, self._text_column, offset)
+        else:
+            self._source_map.add_text(self._text_line, self._text_column, self._document.source,
+                                      offset, end, _UTF16_COLUMNS)
+
+    def source_position(self, text_index):
+        """
+        Source (line, column) shown at a text index, with 1-based lines and
+        0-based columns like Tk indexes. Text added by the renderer (bullets,
+        borders, code headers) maps to the start of its source line.
+        """
+        if self._document is None:
+            return 1, 0
+        line, column = map(int, self._textbox.index(text_index).split('.'))
+        return self._source_map.source_position(self._document, line, column)
+
+    def text_index(self, source_line: int, column: int = 0) -> str:
+        """Text index ("line.column") showing a 1-based source line and column."""
+        if self._document is None:
+            return '1.0'
+        line, column = self._source_map.text_position(self._document, source_line, column)
+        return f'{line}.{column}'
+
+    def _insert_image(self, alt: str, url: str, base_tag: str = None):
+        """Insert a placeholder sized from the image header; the image is decoded later."""
+        path = url
+        if self.base_dir and not os.path.isabs(path):
+            path = os.path.join(self.base_dir, path)
+
+        header = None
+        if '://' not in url:
+            header = read_image_header(path)
+        if header is None or not HAVE_PIL:
+            # Remote, missing or undecodable image (or no Pillow): fall back to the alt text
+            self._append(*self._image_alt_text(alt, url, base_tag))
+            return
+
+        _, native_width, native_height = header
+        self._image_fit_width = self._image_max_width()
+        width, height = fit_size(native_width, native_height, self._image_fit_width)
+        try:
+            key = (os.path.abspath(path), os.path.getmtime(path), width, height)
+        except OSError:
+            key = (os.path.abspath(path), 0, width, height)
+
+        self._image_counter += 1
+        name = f'md_image_{self._image_counter}'
+        photo = self.image_cache.get(key)
+        if photo is None:
+            photo = self._placeholder(width, height)
+            self._pending_images[name] = {
+                'path': path, 'key': key, 'alt': alt, 'url': url, 'base_tag': base_tag,
+                'native_width': native_width, 'native_height': native_height,
+                'width': width, 'height': height,
+            }
+            self._schedule_image_check()
+
+        self._textbox.image_create(tk.END, image=photo, name=name)
+        self._text_column += 1
+        self._images[name] = photo
+
+    @staticmethod
+    def _image_alt_text(alt: str, url: str, base_tag: str = None):
+        """Text and tags shown instead of an image that cannot be displayed."""
+        return alt or url, ('italic', base_tag) if base_tag else ('italic',)
+
+    def _placeholder(self, width: int, height: int):
+        photo = self._placeholders.get((width, height))
+        if photo is None:
+            photo = tk.PhotoImage(master=self._textbox, width=width, height=height)
+            self._placeholders[(width, height)] = photo
+        return photo
+
+    def _refit_pending_images(self):
+        """
+        Resize the placeholders of images not decoded yet to the current
+        width. A document rendered before the widget is mapped was sized
+        for IMAGE_DEFAULT_WIDTH.
+        """
+        if not self._pending_images:
+            return
+        max_width = self._image_max_width()
+        if max_width == self._image_fit_width:
+            return
+        self._image_fit_width = max_width
+        for name, request in self._pending_images.items():
+            if name in self._image_jobs:
                 continue
-            
-            # Horizontal rule
-            if re.match(r'^(-{3,}|\*{3,}|_{3,})\s*$', line.strip()):
-                self.insert(tk.END, '─' * 60 + '\n', 'hr')
-                i += 1
+            width, height = fit_size(request['native_width'], request['native_height'], max_width)
+            if (width, height) == (request['width'], request['height']):
                 continue
-            
-            # Headings
-            header_match = re.match(r'^\s*(#{1,6})\s+(.+)$', line)
-            if header_match:
-                level = len(header_match.group(1))
-                content = header_match.group(2)
-                self._insert_formatted_text(content, f'h{level}')
-                self.insert(tk.END, '\n')
-                i += 1
+            request['width'], request['height'] = width, height
+            request['key'] = request['key'][:2] + (width, height)
+            self._show_image(name, self._placeholder(width, height))
+
+    def _image_max_width(self) -> int:
+        width = self._textbox.winfo_width()
+        if width <= 1:
+            width = self.IMAGE_DEFAULT_WIDTH
+        return max(1, width - 40)
+
+    @classmethod
+    def _get_image_executor(cls):
+        if CTkMarkdown._image_executor is None:
+            CTkMarkdown._image_executor = ThreadPoolExecutor(
+                max_workers=2, thread_name_prefix='ctk-markdown-image')
+        return CTkMarkdown._image_executor
+
+    def _on_yscroll(self, first, last):
+        """Forward scrolling to the scrollbar and look for images entering the viewport."""
+        self._y_scrollbar.set(first, last)
+        if self._pending_images:
+            self._schedule_image_check()
+
+    def _schedule_image_check(self, event=None):
+        if self._image_check_id is None and self._pending_images:
+            self._image_check_id = self.after_idle(self._check_visible_images)
+
+    def _check_visible_images(self):
+        """Start decoding pending images that are in or near the viewport."""
+        self._image_check_id = None
+        tb = self._textbox
+        first = int(tb.index('@0,0').split('.')[0]) - self.IMAGE_PREFETCH_LINES
+        last = int(tb.index(f'@0,{tb.winfo_height()}').split('.')[0]) + self.IMAGE_PREFETCH_LINES
+
+        for name, request in list(self._pending_images.items()):
+            if name in self._image_jobs:
                 continue
-            
-            # Blockquote
-            if line.strip().startswith('>'):
-                quote_lines = []
-                while i < len(lines) and lines[i].strip().startswith('>'):
-                    quote_lines.append(lines[i].strip()[1:].strip())
-                    i += 1
-                quote_text = ' '.join(quote_lines)
-                self.insert(tk.END, '┃ ', 'blockquote')
-                self._insert_formatted_text(quote_text + '      ', 'blockquote')
-                self.insert(tk.END, '\n\n')
+            line = int(tb.index(name).split('.')[0])
+            if not first <= line <= last:
                 continue
-            
-            # Unordered list
-            list_match = re.match(r'^(\s*)([-*+])\s+(.+)$', line)
-            if list_match:
-                indent = len(list_match.group(1)) // 2
-                content = list_match.group(3)
-                
-                # Checkbox
-                checkbox_match = re.match(r'\[([ xX])\]\s*(.+)', content)
-                if checkbox_match:
-                    checked = checkbox_match.group(1).lower() == 'x'
-                    text_content = checkbox_match.group(2)
-                    checkbox = '☑' if checked else '☐'
-                    tag = 'checkbox_done' if checked else 'checkbox_pending'
-                    self.insert(tk.END, '  ' * indent + checkbox + ' ', tag)
-                    self._insert_formatted_text(text_content, 'list_item')
-                else:
-                    self.insert(tk.END, '  ' * indent + '• ', 'list_bullet')
-                    self._insert_formatted_text(content, 'list_item')
-                
-                self.insert(tk.END, '\n')
-                i += 1
+            cached = self.image_cache.get(request['key'])
+            if cached is not None:
+                del self._pending_images[name]
+                self._show_image(name, cached)
                 continue
-            
-            # Ordered list
-            ordered_match = re.match(r'^(\s*)(\d+)\.\s+(.+)$', line)
-            if ordered_match:
-                indent = len(ordered_match.group(1)) // 2
-                num = ordered_match.group(2)
-                content = ordered_match.group(3)
-                self.insert(tk.END, '  ' * indent + f'{num}. ', 'list_number')
-                self._insert_formatted_text(content, 'list_item')
-                self.insert(tk.END, '\n')
-                i += 1
+            self._image_jobs[name] = self._get_image_executor().submit(
+                decode_image, request['path'], request['width'], request['height'])
+
+        if self._image_jobs and self._image_poll_id is None:
+            self._image_poll_id = self.after(self.IMAGE_POLL_MS, self._poll_image_jobs)
+
+    def _poll_image_jobs(self):
+        """Swap finished decodes in on the Tk thread."""
+        self._image_poll_id = None
+        for name, job in list(self._image_jobs.items()):
+            if not job.done():
                 continue
-            
-            # Table
-            if '|' in line and i + 1 < len(lines) and re.match(r'^[\s|:-]+$', lines[i + 1]):
-                table_lines = []
-                while i < len(lines) and '|' in lines[i]:
-                    table_lines.append(lines[i])
-                    i += 1
-                self._insert_table(table_lines)
+            del self._image_jobs[name]
+            request = self._pending_images.pop(name, None)
+            if request is None:
                 continue
-            
-            # Normal paragraph
-            if line.strip():
-                self._insert_formatted_text(line)
-                self.insert(tk.END, '\n')
-            else:
-                self.insert(tk.END, '\n')
-            
-            i += 1
+            try:
+                photo = self._photo_from_decoded(job.result())
+            except Exception:
+                # Corrupt, oversized or unsupported file: show the alt text
+                # and keep polling the other jobs
+                self._replace_image_with_text(name, request)
+                continue
+            self.image_cache.put(request['key'], photo, photo.width() * photo.height() * 4)
+            self._show_image(name, photo)
+
+        if self._image_jobs:
+            self._image_poll_id = self.after(self.IMAGE_POLL_MS, self._poll_image_jobs)
 
+    def _photo_from_decoded(self, image):
+        from PIL import ImageTk
+        return ImageTk.PhotoImage(image, master=self._textbox)
+
+    def _show_image(self, name: str, photo):
+        self._textbox.image_configure(name, image=photo)
+        self._images[name] = photo
+
+    def _replace_image_with_text(self, name: str, request: dict):
+        text, tags = self._image_alt_text(request['alt'], request['url'], request['base_tag'])
+        index = self._textbox.index(name)
+        self.configure(state='normal')
+        self._textbox.delete(index)
+        self._textbox.insert(index, text, tags)
         self.configure(state='disabled')
-    
-    def _insert_formatted_text(self, text: str, base_tag: str = None):
-        """Insert text with inline formatting."""
-        pattern = re.compile(
-            r'(?P<bold_italic>\*\*\*(?P<bold_italic_text>.+?)\*\*\*|___(?P<bold_italic_text2>.+?)___)'
-            r'|(?P<bold>\*\*(?P<bold_text>.+?)\*\*|__(?P<bold_text2>.+?)__)'
-            r'|(?P<italic>\*(?P<italic_text>.+?)\*|_(?P<italic_text2>.+?)_)'
-            r'|(?P<strike>~~(?P<strike_text>.+?)~~)'
-            r'|(?P<code>`(?P<code_text>[^`]+)`)' 
-            r'|(?P<link>\[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)]+)\))'
-        )
-
-        last_end = 0
-        for match in pattern.finditer(text):
-            start, end = match.span()
-            # Text before formatting
-            if start > last_end:
-                plain_text = text[last_end:start]
-                if base_tag:
-                    self.insert(tk.END, plain_text, base_tag)
-                else:
-                    self.insert(tk.END, plain_text)
-
-            if match.group('bold_italic'):
-                content = match.group('bold_italic_text') or match.group('bold_italic_text2')
-                tags = ('bold_italic', base_tag) if base_tag else ('bold_italic',)
-                self.insert(tk.END, content, tags)
-            elif match.group('bold'):
-                content = match.group('bold_text') or match.group('bold_text2')
-                tags = ('bold', base_tag) if base_tag else ('bold',)
-                self.insert(tk.END, content, tags)
-            elif match.group('italic'):
-                content = match.group('italic_text') or match.group('italic_text2')
-                tags = ('italic', base_tag) if base_tag else ('italic',)
-                self.insert(tk.END, content, tags)
-            elif match.group('strike'):
-                content = match.group('strike_text')
-                tags = ('strikethrough', base_tag) if base_tag else ('strikethrough',)
-                self.insert(tk.END, content, tags)
-            elif match.group('code'):
-                content = match.group('code_text')
-                tags = ('code_inline', base_tag) if base_tag else ('code_inline',)
-                self.insert(tk.END, content, tags)
-            elif match.group('link'):
-                link_text = match.group('link_text')
-                # link_url = match.group('link_url')  # Can be used to open links
-                tags = ('link', base_tag) if base_tag else ('link',)
-                self.insert(tk.END, link_text, tags)
-
-            last_end = end
-        
-        # Remaining text
-        if last_end < len(text):
-            remaining = text[last_end:]
-            if base_tag:
-                self.insert(tk.END, remaining, base_tag)
-            else:
-                self.insert(tk.END, remaining)
-    
-    def _insert_code_block(self, code: str, language: str):
-        """Insert a code block with syntax highlighting."""
-        self.insert(tk.END, '\n')
+        self._images.pop(name, None)
+        # The one-column image became the alt text: move the later anchors
+        # on this line so the source map stays in step
+        line, column = map(int, index.split('.'))
+        self._source_map.shift(line, column, _column_width(text) - 1)
+
+    def _cancel_image_jobs(self):
+        for job in self._image_jobs.values():
+            job.cancel()
+        self._image_jobs.clear()
+        self._pending_images.clear()
+        if self._image_poll_id is not None:
+            self.after_cancel(self._image_poll_id)
+            self._image_poll_id = None
+
+    def _insert_code_block(self, code: str, language: str, offset: int = None):
+        """Insert a code block with syntax highlighting; ``offset`` is its source offset."""
+        self._append('\n')
         
         # Code block header
         if language:
             lang_display = language.upper()
-            self.insert(tk.END, f' {lang_display} \n', 'code_block')
+            self._append(f' {lang_display} \n', 'code_block')
+
+        # Code lines are copied verbatim, one text line per source line
+        if offset is not None:
+            for k, line in enumerate(code.split('\n')):
+                self._source_map.add_text(self._text_line + k, 0, self._document.source,
+                                          offset, offset + len(line), _UTF16_COLUMNS)
+                offset += len(line) + 1
         
         # Apply syntax highlighting
-        if language in ('python', 'py'):
-            self._highlight_python(code)
-        elif language in ('javascript', 'js', 'typescript', 'ts'):
-            self._highlight_javascript(code)
+        lexer = lexers.get_lexer(language)
+        if lexer is not None:
+            for line in code.split('\n'):
+                self._highlight_line(line, lexer)
+                self._append('\n', 'code_block')
         else:
-            self.insert(tk.END, code + '\n', 'code_block')
+            self._append(code + '\n', 'code_block')
 
-        self.insert(tk.END, '\n')
-    
-    def _highlight_python(self, code: str):
-        """Syntax highlighting for Python."""
-        # Patterns for Python
-        patterns = [
-            (r'#.*$', 'code_comment'),                           # Comments
-            (r'("""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\')', 'code_string'),  # Docstrings
-            (r'(["\'])(?:(?!\1|\\).|\\.)*\1', 'code_string'),    # Strings
-            (r'\b(\d+\.?\d*)\b', 'code_number'),                 # Numbers
-            (r'@\w+', 'code_decorator'),                          # Decorators
-            (r'\bdef\s+(\w+)', 'code_function'),                 # Functions
-            (r'\bclass\s+(\w+)', 'code_class'),                  # Classes
-        ]
-        
-        lines = code.split('\n')
-        for line in lines:
-            self._highlight_line(line, patterns, self.PYTHON_KEYWORDS)
-            self.insert(tk.END, '\n', 'code_block')
-    
-    def _highlight_javascript(self, code: str):
-        """Syntax highlighting for JavaScript."""
-        patterns = [
-            (r'//.*$', 'code_comment'),                          # Line comments
-            (r'/\*[\s\S]*?\*/', 'code_comment'),                 # Block comments
-            (r'(["\'])(?:(?!\1|\\).|\\.)*\1', 'code_string'),   # Strings
-            (r'`[^`]*`', 'code_string'),                         # Template literals
-            (r'\b(\d+\.?\d*)\b', 'code_number'),                 # Numbers
-            (r'\bfunction\s+(\w+)', 'code_function'),            # Functions
-            (r'const\s+(\w+)\s*=\s*\([^)]*\)\s*=>', 'code_function'),  # Arrow functions
-        ]
-        
-        lines = code.split('\n')
-        for line in lines:
-            self._highlight_line(line, patterns, self.JS_KEYWORDS)
-            self.insert(tk.END, '\n', 'code_block')
+        self._append('\n')
     
-    def _highlight_line(self, line: str, patterns: list, keywords: set):
+    def _highlight_line(self, line: str, lexer):
         """Apply highlighting to a line."""
-        if not line:
-            return
-        
-        # Find all matches
-        highlights = []  # (start, end, tag)
-        
-        for pattern, tag in patterns:
-            for match in re.finditer(pattern, line, re.MULTILINE):
-                highlights.append((match.start(), match.end(), tag))
-        
-        # Add keywords
-        for keyword in keywords:
-            pattern = rf'\b{re.escape(keyword)}\b'
-            for match in re.finditer(pattern, line):
-                highlights.append((match.start(), match.end(), 'code_keyword'))
-        
-        # Sort and remove overlaps
-        highlights.sort(key=lambda x: (x[0], -x[1]))
-        filtered = []
-        last_end = 0
-        for start, end, tag in highlights:
-            if start >= last_end:
-                filtered.append((start, end, tag))
-                last_end = end
-        
-        # Insert text with highlighting
         last_pos = 0
-        for start, end, tag in filtered:
+        for start, end, tag in lexer.tokenize(line):
             if start > last_pos:
-                self.insert(tk.END, line[last_pos:start], 'code_block')
-            self.insert(tk.END, line[start:end], ('code_block', tag))
+                self._append(line[last_pos:start], 'code_block')
+            self._append(line[start:end], ('code_block', tag))
             last_pos = end
         
         if last_pos < len(line):
-            self.insert(tk.END, line[last_pos:], 'code_block')
+            self._append(line[last_pos:], 'code_block')
     
     def _insert_table(self, table_lines: list):
         """Insert a table using a real widget (Frame + Grid) for precise alignment."""
@@ -573,9 +737,10 @@ class CTkMarkdown(ctk.CTkTextbox):
             table_frame.columnconfigure(col, weight=1)
 
         # Insert the table widget inside the Text
-        self.insert(tk.END, '\n')
+        self._append('\n')
         self._textbox.window_create(tk.END, window=table_frame)
-        self.insert(tk.END, '\n')
+        self._text_column += 1
+        self._append('\n')
     
     def _insert_sample(self):
         """Insert sample text."""
@@ -0,0 +1,328 @@
+"""
+Compact Markdown document model.
+Blocks and inline spans are stored column-wise in ``array`` objects and all
+text is kept as offsets into the original source string, so a parsed
+document costs a few bytes per block instead of a Python object per line.
+"""
+
+import re
+from array import array
+from bisect import bisect_right
+
+# Block kinds
+BLANK = 0
+PARAGRAPH = 1
+HEADING = 2
+HR = 3
+QUOTE = 4           # first line of a blockquote
+QUOTE_CONT = 5      # following lines of the same blockquote
+BULLET = 6
+TASK = 7
+ORDERED = 8
+CODE = 9
+TABLE = 10
+
+# Inline span tags
+SPAN_TEXT = 0
+SPAN_BOLD_ITALIC = 1
+SPAN_BOLD = 2
+SPAN_ITALIC = 3
+SPAN_STRIKE = 4
+SPAN_CODE = 5
+SPAN_LINK = 6
+SPAN_IMAGE = 7
+
+# Quote continuation level: the joining space falls inside hidden markup
+# (e.g. a link target spanning lines) and is not displayed
+HIDDEN_JOIN = 255
+
+# Text tag used by the renderers for each inline span tag
+SPAN_TAG_NAMES = (None, 'bold_italic', 'bold', 'italic', 'strikethrough', 'code_inline', 'link', None)
+
+# Blocks whose content is parsed for inline formatting on its own; quotes are
+# parsed as one paragraph over all their lines (see Document.add_quote)
+INLINE_BLOCKS = frozenset((PARAGRAPH, HEADING, BULLET, TASK, ORDERED))
+
+HR_PATTERN = re.compile(r'^(-{3,}|\*{3,}|_{3,})\s*$')
+HEADING_PATTERN = re.compile(r'^\s*(#{1,6})\s+(.+)$')
+BULLET_PATTERN = re.compile(r'^(\s*)([-*+])\s+(.+)$')
+TASK_PATTERN = re.compile(r'\[([ xX])\]\s*(.+)')
+ORDERED_PATTERN = re.compile(r'^(\s*)(\d+)\.\s+(.+)$')
+TABLE_RULE_PATTERN = re.compile(r'^[\s|:-]+$')
+
+INLINE_PATTERN = re.compile(
+    r'(?P<bold_italic>\*\*\*(?P<bold_italic_text>.+?)\*\*\*|___(?P<bold_italic_text2>.+?)___)'
+    r'|(?P<bold>\*\*(?P<bold_text>.+?)\*\*|__(?P<bold_text2>.+?)__)'
+    r'|(?P<italic>\*(?P<italic_text>.+?)\*|_(?P<italic_text2>.+?)_)'
+    r'|(?P<strike>~~(?P<strike_text>.+?)~~)'
+    r'|(?P<code>`(?P<code_text>[^`]+)`)'
+    r'|(?P<image>!\[(?P<image_alt>[^\]]*)\]\((?P<image_url>[^)\s]+)(?:\s+"[^"]*")?\))'
+    r'|(?P<link>\[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)]+)\))'
+)
+
+# (outer group, text groups, span tag, aux group)
+_INLINE_GROUPS = (
+    ('bold_italic', ('bold_italic_text', 'bold_italic_text2'), SPAN_BOLD_ITALIC, None),
+    ('bold', ('bold_text', 'bold_text2'), SPAN_BOLD, None),
+    ('italic', ('italic_text', 'italic_text2'), SPAN_ITALIC, None),
+    ('strike', ('strike_text',), SPAN_STRIKE, None),
+    ('code', ('code_text',), SPAN_CODE, None),
+    ('image', ('image_alt',), SPAN_IMAGE, 'image_url'),
+    ('link', ('link_text',), SPAN_LINK, 'link_url'),
+)
+
+
+class Document:
+    """
+    Parsed Markdown held as parallel columns.
+
+    Block ``i`` has kind ``kinds[i]``, starts on source line ``lines[i]``,
+    its content is ``source[starts[i]:ends[i]]`` and ``levels[i]`` holds the
+    heading level, the list indent, or for a quote continuation line the span
+    tag of the space joining it to the previous line (``HIDDEN_JOIN`` if the
+    space is not displayed). ``aux_starts``/``aux_ends`` point at the
+    code language, the ordered list number or the task checkbox mark.
+    Its inline spans are ``span_first[i]:span_first[i + 1]``; span ``j`` shows
+    ``source[span_starts[j]:span_ends[j]]`` with tag ``span_tags[j]`` and
+    keeps the link or image target in ``span_aux_starts``/``span_aux_ends``.
+    """
+
+    __slots__ = (
+        'source', 'line_starts',
+        'kinds', 'lines', 'starts', 'ends', 'levels', 'aux_starts', 'aux_ends',
+        'span_first', 'span_tags', 'span_starts', 'span_ends', 'span_aux_starts', 'span_aux_ends',
+    )
+
+    def __init__(self, source: str):
+        self.source = source
+        self.line_starts = array('i')
+        self.kinds = array('B')
+        self.lines = array('i')
+        self.starts = array('i')
+        self.ends = array('i')
+        self.levels = array('B')
+        self.aux_starts = array('i')
+        self.aux_ends = array('i')
+        self.span_first = array('i', [0])
+        self.span_tags = array('B')
+        self.span_starts = array('i')
+        self.span_ends = array('i')
+        self.span_aux_starts = array('i')
+        self.span_aux_ends = array('i')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def block_text(self, block: int) -> str:
+        return self.source[self.starts[block]:self.ends[block]]
+
+    def block_aux(self, block: int) -> str:
+        return self.source[self.aux_starts[block]:self.aux_ends[block]]
+
+    def block_spans(self, block: int) -> range:
+        return range(self.span_first[block], self.span_first[block + 1])
+
+    def line_of(self, offset: int) -> int:
+        """Source line (0-based) containing ``offset``."""
+        return bisect_right(self.line_starts, offset) - 1
+
+    def add_block(self, kind: int, line: int, start: int, end: int, level: int = 0,
+                  aux_start: int = 0, aux_end: int = 0):
+        self.kinds.append(kind)
+        self.lines.append(line)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.levels.append(min(level, 255))
+        self.aux_starts.append(aux_start)
+        self.aux_ends.append(aux_end)
+        if kind in INLINE_BLOCKS:
+            self._parse_inline(start, end)
+        self.span_first.append(len(self.span_tags))
+
+    def add_quote(self, first_line: int, segments: list):
+        """
+        Add a blockquote, one block per quoted line. ``segments`` holds the
+        (start, end) source offsets of each line's content. Inline formatting
+        is parsed over the lines joined with spaces, so emphasis may span
+        lines; spans crossing a line break are split into one piece per line.
+        """
+        joined = ' '.join(self.source[start:end] for start, end in segments)
+        # Offset of each segment inside the joined text
+        bases = []
+        position = 0
+        for start, end in segments:
+            bases.append(position)
+            position += end - start + 1
+
+        def to_source(offset):
+            k = bisect_right(bases, offset) - 1
+            return segments[k][0] + offset - bases[k]
+
+        pieces = [[] for _ in segments]
+        # A join no span text covers lies inside markup and stays hidden
+        separators = [HIDDEN_JOIN] * len(segments)
+        for tag, start, end, aux_start, aux_end in _inline_spans(joined, 0, len(joined)):
+            if aux_end > aux_start:
+                aux_start, aux_end = to_source(aux_start), to_source(aux_end - 1) + 1
+            k = bisect_right(bases, start) - 1
+            while start < end:
+                segment_end = bases[k] + segments[k][1] - segments[k][0]
+                if start >= segment_end:
+                    # The joining space belongs to this span
+                    separators[k + 1] = tag
+                    start = segment_end + 1
+                    k += 1
+                    continue
+                piece_end = min(end, segment_end)
+                shift = segments[k][0] - bases[k]
+                pieces[k].append((tag, start + shift, piece_end + shift, aux_start, aux_end))
+                if tag == SPAN_IMAGE:
+                    break  # an image is shown once
+                start = piece_end
+
+        for k, (start, end) in enumerate(segments):
+            self.kinds.append(QUOTE if k == 0 else QUOTE_CONT)
+            self.lines.append(first_line + k)
+            self.starts.append(start)
+            self.ends.append(end)
+            self.levels.append(separators[k])
+            self.aux_starts.append(0)
+            self.aux_ends.append(0)
+            for span in pieces[k]:
+                self._add_span(*span)
+            self.span_first.append(len(self.span_tags))
+
+    def _add_span(self, tag: int, start: int, end: int, aux_start: int = 0, aux_end: int = 0):
+        self.span_tags.append(tag)
+        self.span_starts.append(start)
+        self.span_ends.append(end)
+        self.span_aux_starts.append(aux_start)
+        self.span_aux_ends.append(aux_end)
+
+    def _parse_inline(self, start: int, end: int):
+        """Split source[start:end] into inline spans."""
+        for span in _inline_spans(self.source, start, end):
+            self._add_span(*span)
+
+
+def _inline_spans(text: str, start: int, end: int):
+    """Yield (tag, start, end, aux_start, aux_end) for the spans of text[start:end]."""
+    last_end = start
+    for match in INLINE_PATTERN.finditer(text, start, end):
+        if match.start() > last_end:
+            yield SPAN_TEXT, last_end, match.start(), 0, 0
+        for group, text_groups, tag, aux_group in _INLINE_GROUPS:
+            if match.group(group) is None:
+                continue
+            for text_group in text_groups:
+                if match.group(text_group) is not None:
+                    span_start, span_end = match.span(text_group)
+                    break
+            aux_start, aux_end = match.span(aux_group) if aux_group else (0, 0)
+            yield tag, span_start, span_end, aux_start, aux_end
+            break
+        last_end = match.end()
+    if last_end < end:
+        yield SPAN_TEXT, last_end, end, 0, 0
+
+
+def _strip_bounds(line: str, offset: int):
+    """Source offsets of line.strip() for a line starting at ``offset``."""
+    stripped = line.strip()
+    start = offset + len(line) - len(line.lstrip())
+    return start, start + len(stripped)
+
+
+def parse_markdown(text: str) -> Document:
+    """Parse Markdown into a Document."""
+    doc = Document(text)
+    lines = text.split('\n')
+    line_starts = doc.line_starts
+    offset = 0
+    for line in lines:
+        line_starts.append(offset)
+        offset += len(line) + 1
+
+    n = len(lines)
+    i = 0
+    while i < n:
+        line = lines[i]
+        base = line_starts[i]
+        stripped = line.strip()
+
+        # Code block (an unclosed fence swallows the rest of the document)
+        if stripped.startswith('```'):
+            j = i + 1
+            while j < n and not lines[j].strip().startswith('```'):
+                j += 1
+            if j < n:
+                lang_start, lang_end = _strip_bounds(stripped[3:], _strip_bounds(line, base)[0] + 3)
+                start = line_starts[i + 1]
+                end = max(start, line_starts[j] - 1)
+                doc.add_block(CODE, i, start, end, 0, lang_start, lang_end)
+            i = j + 1
+            continue
+
+        # Horizontal rule
+        if HR_PATTERN.match(stripped):
+            doc.add_block(HR, i, base, base + len(line))
+            i += 1
+            continue
+
+        # Headings
+        match = HEADING_PATTERN.match(line)
+        if match:
+            doc.add_block(HEADING, i, base + match.start(2), base + match.end(2), len(match.group(1)))
+            i += 1
+            continue
+
+        # Blockquote, one block per quoted line
+        if stripped.startswith('>'):
+            first_line = i
+            segments = []
+            while i < n and lines[i].strip().startswith('>'):
+                quoted = lines[i].strip()[1:]
+                segments.append(_strip_bounds(quoted, _strip_bounds(lines[i], line_starts[i])[0] + 1))
+                i += 1
+            doc.add_quote(first_line, segments)
+            continue
+
+        # Unordered list and checkboxes
+        match = BULLET_PATTERN.match(line)
+        if match:
+            indent = len(match.group(1)) // 2
+            task = TASK_PATTERN.match(match.group(3))
+            if task:
+                content = base + match.start(3)
+                doc.add_block(TASK, i, content + task.start(2), content + task.end(2), indent,
+                              content + task.start(1), content + task.end(1))
+            else:
+                doc.add_block(BULLET, i, base + match.start(3), base + match.end(3), indent)
+            i += 1
+            continue
+
+        # Ordered list
+        match = ORDERED_PATTERN.match(line)
+        if match:
+            doc.add_block(ORDERED, i, base + match.start(3), base + match.end(3),
+                          len(match.group(1)) // 2, base + match.start(2), base + match.end(2))
+            i += 1
+            continue
+
+        # Table
+        if '|' in line and i + 1 < n and TABLE_RULE_PATTERN.match(lines[i + 1]):
+            j = i
+            while j < n and '|' in lines[j]:
+                j += 1
+            doc.add_block(TABLE, i, base, line_starts[j - 1] + len(lines[j - 1]))
+            i = j
+            continue
+
+        # Normal paragraph
+        if stripped:
+            doc.add_block(PARAGRAPH, i, base, base + len(line))
+        else:
+            doc.add_block(BLANK, i, base, base)
+        i += 1
+
+    return doc
@@ -0,0 +1,123 @@
+"""
+Image support helpers for the Markdown renderer.
+Reads image dimensions from file headers, decodes images off the Tk thread
+and keeps decoded images in a byte-bounded LRU cache.
+"""
+
+import importlib.util
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+# Decoding needs Pillow (the "images" extra); without it images render as
+# their alt text. It is only imported when an image is actually decoded, to
+# keep the package import cheap.
+HAVE_PIL = importlib.util.find_spec('PIL') is not None
+
+
+def read_image_header(path: str):
+    """Return (format, width, height) read from the file header, or None."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(32)
+            if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+                width, height = struct.unpack('>II', head[16:24])
+                return 'png', width, height
+            if head[:6] in (b'GIF87a', b'GIF89a'):
+                width, height = struct.unpack('<HH', head[6:10])
+                return 'gif', width, height
+            if head[:2] == b'\xff\xd8':
+                f.seek(2)
+                return _read_jpeg_size(f)
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+def _read_jpeg_size(f):
+    """Walk the JPEG markers until the first SOF segment."""
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        length = struct.unpack('>H', f.read(2))[0]
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>xHH', f.read(5))
+            return 'jpeg', width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def fit_size(width: int, height: int, max_width: int):
+    """Scale (width, height) down so it fits max_width, keeping the ratio."""
+    if max_width <= 0 or width <= max_width:
+        return width, height
+    return max_width, max(1, round(height * max_width / width))
+
+
+def decode_image(path: str, width: int, height: int):
+    """
+    Decode and scale an image to exactly (width, height), the size of its
+    placeholder. Runs in a worker thread, so it must not touch Tk; the widget
+    only wraps the result in a PhotoImage on the main thread.
+    """
+    from PIL import Image
+    with Image.open(path) as img:
+        img.draft('RGB', (width, height))
+        img = img.convert('RGBA')
+        if img.size != (width, height):
+            img = img.resize((width, height), Image.LANCZOS)
+        return img
+
+
+class ImageCache:
+    """Byte-bounded LRU cache shared by all CTkMarkdown instances."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._items = OrderedDict()  # key -> (image, nbytes)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, image, nbytes: int):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            if nbytes > self.max_bytes:
+                return
+            self._items[key] = (image, nbytes)
+            self.current_bytes += nbytes
+            self._evict()
+
+    def resize(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.current_bytes = 0
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._items:
+            _, (_, nbytes) = self._items.popitem(last=False)
+            self.current_bytes -= nbytes
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
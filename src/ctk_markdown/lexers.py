@@ -0,0 +1,105 @@
+"""
+Line-based syntax highlighting for code blocks.
+Lexers only produce (start, end, tag) tokens; they do not depend on Tk.
+"""
+
+import re
+
+PYTHON_KEYWORDS = {
+    'False', 'None', 'True', 'and', 'as', 'assert', 'async', 'await',
+    'break', 'class', 'continue', 'def', 'del', 'elif', 'else', 'except',
+    'finally', 'for', 'from', 'global', 'if', 'import', 'in', 'is',
+    'lambda', 'nonlocal', 'not', 'or', 'pass', 'raise', 'return', 'try',
+    'while', 'with', 'yield', 'print', 'len', 'range', 'str', 'int',
+    'float', 'list', 'dict', 'set', 'tuple', 'open', 'input', 'type'
+}
+
+JS_KEYWORDS = {
+    'async', 'await', 'break', 'case', 'catch', 'class', 'const', 'continue',
+    'debugger', 'default', 'delete', 'do', 'else', 'export', 'extends',
+    'finally', 'for', 'function', 'if', 'import', 'in', 'instanceof',
+    'let', 'new', 'return', 'static', 'super', 'switch', 'this', 'throw',
+    'try', 'typeof', 'var', 'void', 'while', 'with', 'yield', 'console',
+    'log', 'true', 'false', 'null', 'undefined'
+}
+
+PYTHON_PATTERNS = [
+    (r'#.*$', 'code_comment'),                           # Comments
+    (r'("""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\')', 'code_string'),  # Docstrings
+    (r'(["\'])(?:(?!\1|\\).|\\.)*\1', 'code_string'),    # Strings
+    (r'\b(\d+\.?\d*)\b', 'code_number'),                 # Numbers
+    (r'@\w+', 'code_decorator'),                          # Decorators
+    (r'\bdef\s+(\w+)', 'code_function'),                 # Functions
+    (r'\bclass\s+(\w+)', 'code_class'),                  # Classes
+]
+
+JS_PATTERNS = [
+    (r'//.*$', 'code_comment'),                          # Line comments
+    (r'/\*[\s\S]*?\*/', 'code_comment'),                 # Block comments
+    (r'(["\'])(?:(?!\1|\\).|\\.)*\1', 'code_string'),   # Strings
+    (r'`[^`]*`', 'code_string'),                         # Template literals
+    (r'\b(\d+\.?\d*)\b', 'code_number'),                 # Numbers
+    (r'\bfunction\s+(\w+)', 'code_function'),            # Functions
+    (r'const\s+(\w+)\s*=\s*\([^)]*\)\s*=>', 'code_function'),  # Arrow functions
+]
+
+# Every tag a lexer can emit
+TOKEN_TAGS = (
+    'code_keyword', 'code_string', 'code_comment', 'code_number',
+    'code_function', 'code_class', 'code_decorator', 'code_operator',
+)
+
+
+class Lexer:
+    """Regex patterns plus a keyword set, compiled once."""
+
+    __slots__ = ('patterns', 'keywords', 'keyword_pattern')
+
+    def __init__(self, patterns: list, keywords: set):
+        self.patterns = [(re.compile(pattern, re.MULTILINE), tag) for pattern, tag in patterns]
+        self.keywords = keywords
+        # Keywords are whole words, so one alternation finds the same matches
+        # as one pattern per keyword
+        words = sorted(keywords, key=len, reverse=True)
+        self.keyword_pattern = re.compile(r'\b(?:' + '|'.join(map(re.escape, words)) + r')\b')
+
+    def tokenize(self, line: str) -> list:
+        """Return the non-overlapping (start, end, tag) tokens of a line."""
+        if not line:
+            return []
+
+        # Find all matches
+        highlights = []  # (start, end, tag)
+        for pattern, tag in self.patterns:
+            for match in pattern.finditer(line):
+                highlights.append((match.start(), match.end(), tag))
+        for match in self.keyword_pattern.finditer(line):
+            highlights.append((match.start(), match.end(), 'code_keyword'))
+
+        # Sort and remove overlaps
+        highlights.sort(key=lambda x: (x[0], -x[1]))
+        filtered = []
+        last_end = 0
+        for start, end, tag in highlights:
+            if start >= last_end:
+                filtered.append((start, end, tag))
+                last_end = end
+        return filtered
+
+
+PYTHON_LEXER = Lexer(PYTHON_PATTERNS, PYTHON_KEYWORDS)
+JS_LEXER = Lexer(JS_PATTERNS, JS_KEYWORDS)
+
+LEXERS = {
+    'python': PYTHON_LEXER,
+    'py': PYTHON_LEXER,
+    'javascript': JS_LEXER,
+    'js': JS_LEXER,
+    'typescript': JS_LEXER,
+    'ts': JS_LEXER,
+}
+
+
+def get_lexer(language: str):
+    """Lexer for a code block language, or None for plain code."""
+    return LEXERS.get(language)
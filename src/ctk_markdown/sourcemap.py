@@ -0,0 +1,111 @@
+"""
+Sorted mapping between rendered text positions and Markdown source offsets.
+Anchors are recorded in document order while rendering, so both columns are
+non-decreasing and every lookup is a single bisect.
+"""
+
+import re
+from array import array
+from bisect import bisect_right
+
+# Text positions are packed as (line << _COLUMN_BITS) | column
+_COLUMN_BITS = 32
+_COLUMN_MASK = (1 << _COLUMN_BITS) - 1
+
+# Characters outside the BMP, two columns wide when Tk counts UTF-16 units
+_ASTRAL_PATTERN = re.compile('[\U00010000-\U0010ffff]')
+
+
+class SourceMap:
+    """
+    Anchor ``i`` says that rendered text position ``text_keys[i]`` shows the
+    source character at ``offsets[i]``, and that the text is a verbatim copy
+    of ``source[offsets[i]:ends[i]]`` from there on. Decorations added by the
+    renderer (bullets, rules, padding) get anchors with an empty range.
+    Within a range one column is one source character; ``add_text`` splits
+    the range where that does not hold.
+    """
+
+    __slots__ = ('text_keys', 'offsets', 'ends')
+
+    def __init__(self):
+        self.text_keys = array('q')
+        self.offsets = array('i')
+        self.ends = array('i')
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def add(self, line: int, column: int, offset: int, end: int = None):
+        self.text_keys.append((line << _COLUMN_BITS) | column)
+        self.offsets.append(offset)
+        self.ends.append(offset if end is None else end)
+
+    def add_text(self, line: int, column: int, source: str, offset: int, end: int,
+                 utf16: bool = False):
+        """
+        Anchor a verbatim copy of source[offset:end]. With ``utf16`` columns a
+        character outside the BMP takes two, so the range is cut before it
+        and a new anchor starts after it.
+        """
+        if utf16:
+            for match in _ASTRAL_PATTERN.finditer(source, offset, end):
+                position = match.start()
+                self.add(line, column, offset, position)
+                column += position - offset + 2
+                offset = position + 1
+        self.add(line, column, offset, end)
+
+    def shift(self, line: int, column: int, delta: int):
+        """Move the anchors after (line, column) on the same text line by ``delta`` columns."""
+        i = bisect_right(self.text_keys, (line << _COLUMN_BITS) | column)
+        while i < len(self.text_keys) and self.text_keys[i] >> _COLUMN_BITS == line:
+            self.text_keys[i] += delta
+            i += 1
+
+    def to_source(self, line: int, column: int):
+        """Source offset shown at a text position, or None before the first anchor."""
+        i = bisect_right(self.text_keys, (line << _COLUMN_BITS) | column) - 1
+        if i < 0:
+            return None
+        key = self.text_keys[i]
+        offset = self.offsets[i]
+        if key >> _COLUMN_BITS == line:
+            offset = min(offset + column - (key & _COLUMN_MASK), self.ends[i])
+        return offset
+
+    def to_text(self, offset: int, line_start: int):
+        """
+        Text (line, column) showing a source offset, or None if the map is
+        empty. ``line_start`` is the offset of the source line; an anchor on
+        an earlier source line only gives its own position.
+        """
+        if not self.offsets:
+            return None
+        i = max(0, bisect_right(self.offsets, offset) - 1)
+        key = self.text_keys[i]
+        column = key & _COLUMN_MASK
+        if line_start <= self.offsets[i] <= offset:
+            column += min(offset, self.ends[i]) - self.offsets[i]
+        return key >> _COLUMN_BITS, column
+
+    def source_position(self, doc, line: int, column: int):
+        """Source (line, column) of ``doc`` shown at a text position; lines are 1-based."""
+        offset = self.to_source(line, column)
+        if offset is None:
+            return 1, 0
+        offset = min(offset, len(doc.source))
+        source_line = doc.line_of(offset)
+        return source_line + 1, offset - doc.line_starts[source_line]
+
+    def text_position(self, doc, source_line: int, column: int = 0):
+        """Text (line, column) showing a 1-based source line and column of ``doc``."""
+        source_line = min(max(source_line, 1), len(doc.line_starts)) - 1
+        line_start = doc.line_starts[source_line]
+        if source_line + 1 < len(doc.line_starts):
+            line_end = doc.line_starts[source_line + 1] - 1
+        else:
+            line_end = len(doc.source)
+        column = min(max(column, 0), line_end - line_start)
+        position = self.to_text(line_start + column, line_start)
+        return (1, 0) if position is None else position
@@ -0,0 +1,96 @@
+from ctk_markdown.document import (
+    BLANK, BULLET, CODE, HEADING, HIDDEN_JOIN, HR, ORDERED, PARAGRAPH, QUOTE, QUOTE_CONT,
+    SPAN_BOLD, SPAN_BOLD_ITALIC, SPAN_CODE, SPAN_IMAGE, SPAN_ITALIC, SPAN_LINK,
+    SPAN_STRIKE, SPAN_TEXT, TABLE, TASK, parse_markdown,
+)
+
+
+def _spans(doc, block):
+    """(tag, text, aux) of each inline span of a block."""
+    return [
+        (doc.span_tags[j], doc.source[doc.span_starts[j]:doc.span_ends[j]],
+         doc.source[doc.span_aux_starts[j]:doc.span_aux_ends[j]])
+        for j in doc.block_spans(block)
+    ]
+
+
+def test_block_kinds_and_lines():
+    doc = parse_markdown('# Title\n\npara\n---\n- item\n2. two\n- [x] done\n```py\ncode\n```\n|a|b|\n|-|-|\n|1|2|')
+    assert list(doc.kinds) == [HEADING, BLANK, PARAGRAPH, HR, BULLET, ORDERED, TASK, CODE, TABLE]
+    assert list(doc.lines) == [0, 1, 2, 3, 4, 5, 6, 7, 10]
+    assert doc.block_text(0) == 'Title' and doc.levels[0] == 1
+    assert doc.block_aux(5) == '2'
+    assert doc.block_text(6) == 'done' and doc.block_aux(6) == 'x'
+    assert doc.block_text(7) == 'code' and doc.block_aux(7) == 'py'
+    assert doc.block_text(8) == '|a|b|\n|-|-|\n|1|2|'
+
+
+def test_list_indent_levels():
+    doc = parse_markdown('- a\n  - b\n    1. c')
+    assert list(doc.levels) == [0, 1, 2]
+
+
+def test_inline_spans():
+    doc = parse_markdown('a ***bi*** **b** *i* ~~s~~ `c` [l](u) ![alt](p.png "t")')
+    assert _spans(doc, 0) == [
+        (SPAN_TEXT, 'a ', ''), (SPAN_BOLD_ITALIC, 'bi', ''), (SPAN_TEXT, ' ', ''),
+        (SPAN_BOLD, 'b', ''), (SPAN_TEXT, ' ', ''), (SPAN_ITALIC, 'i', ''),
+        (SPAN_TEXT, ' ', ''), (SPAN_STRIKE, 's', ''), (SPAN_TEXT, ' ', ''),
+        (SPAN_CODE, 'c', ''), (SPAN_TEXT, ' ', ''), (SPAN_LINK, 'l', 'u'),
+        (SPAN_TEXT, ' ', ''), (SPAN_IMAGE, 'alt', 'p.png'),
+    ]
+
+
+def test_code_blocks_are_not_parsed_inline():
+    doc = parse_markdown('```\n**x**\n```')
+    assert list(doc.kinds) == [CODE]
+    assert _spans(doc, 0) == []
+
+
+def test_unclosed_fence_swallows_the_rest():
+    doc = parse_markdown('```js\nunclosed\nfoo')
+    assert len(doc) == 0
+
+
+def test_empty_code_block():
+    doc = parse_markdown('```\n```\nafter')
+    assert list(doc.kinds) == [CODE, PARAGRAPH]
+    assert doc.block_text(0) == ''
+
+
+def test_indented_heading():
+    doc = parse_markdown('   ## h *i*')
+    assert list(doc.kinds) == [HEADING] and doc.levels[0] == 2
+    assert _spans(doc, 0) == [(SPAN_TEXT, 'h ', ''), (SPAN_ITALIC, 'i', '')]
+
+
+def test_quote_lines_and_plain_join():
+    doc = parse_markdown('> a\n>  b\nafter')
+    assert list(doc.kinds) == [QUOTE, QUOTE_CONT, PARAGRAPH]
+    assert [doc.block_text(i) for i in range(3)] == ['a', 'b', 'after']
+    assert doc.levels[1] == SPAN_TEXT
+
+
+def test_quote_emphasis_across_lines():
+    doc = parse_markdown('> a *b\n> c* d')
+    assert _spans(doc, 0) == [(SPAN_TEXT, 'a ', ''), (SPAN_ITALIC, 'b', '')]
+    assert _spans(doc, 1) == [(SPAN_ITALIC, 'c', ''), (SPAN_TEXT, ' d', '')]
+    assert doc.levels[1] == SPAN_ITALIC
+
+
+def test_quote_link_text_across_lines():
+    doc = parse_markdown('> [l\n> k](u v) e')
+    assert _spans(doc, 0) == [(SPAN_LINK, 'l', 'u v')]
+    assert doc.levels[1] == SPAN_LINK
+
+
+def test_quote_join_inside_link_target_is_hidden():
+    doc = parse_markdown('> [l](x\n> y)')
+    assert [span[:2] for span in _spans(doc, 0)] == [(SPAN_LINK, 'l')]
+    assert _spans(doc, 1) == []
+    assert doc.levels[1] == HIDDEN_JOIN
+
+
+def test_line_of():
+    doc = parse_markdown('a\nbb\n\nc')
+    assert [doc.line_of(offset) for offset in (0, 1, 2, 4, 5, 6)] == [0, 0, 1, 1, 2, 3]
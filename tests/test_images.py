@@ -0,0 +1,77 @@
+import struct
+
+from ctk_markdown.images import ImageCache, fit_size, read_image_header
+
+
+def _write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def _jpeg(sof_code):
+    """SOI, a JFIF APP0 segment, a DQT segment and a SOF of 320x200."""
+    app0 = b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+    dqt = b'\x00' + bytes(64)
+    sof = struct.pack('>BHHB', 8, 200, 320, 3) + bytes(9)
+    return (b'\xff\xd8'
+            + b'\xff\xe0' + struct.pack('>H', len(app0) + 2) + app0
+            + b'\xff\xdb' + struct.pack('>H', len(dqt) + 2) + dqt
+            + bytes((0xFF, sof_code)) + struct.pack('>H', len(sof) + 2) + sof
+            + b'\xff\xd9')
+
+
+def test_png_header(tmp_path):
+    data = b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', 640, 480) + bytes(5)
+    assert read_image_header(_write(tmp_path, 'a.png', data)) == ('png', 640, 480)
+
+
+def test_gif_header(tmp_path):
+    data = b'GIF89a' + struct.pack('<HH', 16, 9) + bytes(8)
+    assert read_image_header(_write(tmp_path, 'a.gif', data)) == ('gif', 16, 9)
+
+
+def test_baseline_jpeg_header(tmp_path):
+    assert read_image_header(_write(tmp_path, 'a.jpg', _jpeg(0xC0))) == ('jpeg', 320, 200)
+
+
+def test_progressive_jpeg_header(tmp_path):
+    assert read_image_header(_write(tmp_path, 'a.jpg', _jpeg(0xC2))) == ('jpeg', 320, 200)
+
+
+def test_unknown_truncated_or_missing_file(tmp_path):
+    assert read_image_header(_write(tmp_path, 'a.txt', b'not an image')) is None
+    assert read_image_header(_write(tmp_path, 'a.jpg', _jpeg(0xC0)[:24])) is None
+    assert read_image_header(str(tmp_path / 'missing.png')) is None
+
+
+def test_fit_size():
+    assert fit_size(300, 200, 600) == (300, 200)
+    assert fit_size(1200, 800, 600) == (600, 400)
+    assert fit_size(5000, 1, 100) == (100, 1)
+    assert fit_size(1200, 800, 0) == (1200, 800)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ImageCache(30)
+    cache.put('a', 'A', 10)
+    cache.put('b', 'B', 10)
+    cache.put('c', 'C', 10)
+    assert cache.get('a') == 'A'
+    cache.put('d', 'D', 10)
+    assert 'b' not in cache
+    assert [key in cache for key in 'acd'] == [True, True, True]
+    assert cache.current_bytes == 30
+
+
+def test_cache_byte_limits():
+    cache = ImageCache(30)
+    cache.put('a', 'A', 10)
+    cache.put('big', 'BIG', 31)
+    assert 'big' not in cache
+    cache.put('a', 'A2', 25)
+    assert len(cache) == 1 and cache.current_bytes == 25
+    cache.put('b', 'B', 10)
+    assert 'a' not in cache and cache.get('b') == 'B'
+    cache.resize(5)
+    assert len(cache) == 0 and cache.current_bytes == 0
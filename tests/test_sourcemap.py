@@ -0,0 +1,172 @@
+import tkinter as tk
+
+import pytest
+
+from ctk_markdown.document import parse_markdown
+from ctk_markdown.sourcemap import SourceMap
+
+
+def _hr_map():
+    """Anchors the renderer records for 'para\\n---\\nnext'."""
+    doc = parse_markdown('para\n---\nnext')
+    smap = SourceMap()
+    smap.add(1, 0, 0)        # block: paragraph
+    smap.add(1, 0, 0, 4)     # span: "para"
+    smap.add(2, 0, 5)        # block: 60-char rule for "---"
+    smap.add(3, 0, 9)        # block: paragraph
+    smap.add(3, 0, 9, 13)    # span: "next"
+    return doc, smap
+
+
+def _emoji_map():
+    """Anchors the renderer records for '# 🎉 Title\\nnext' with UTF-16 columns."""
+    doc = parse_markdown('# 🎉 Title\nnext')
+    smap = SourceMap()
+    smap.add(1, 0, 0)                                    # block: heading
+    smap.add_text(1, 0, doc.source, 2, 9, utf16=True)    # span: "🎉 Title"
+    smap.add(2, 0, 10)                                   # block: paragraph
+    smap.add_text(2, 0, doc.source, 10, 14, utf16=True)  # span: "next"
+    return doc, smap
+
+
+def test_to_source_inside_verbatim_span():
+    smap = SourceMap()
+    smap.add(1, 0, 10, 14)
+    assert smap.to_source(1, 0) == 10
+    assert smap.to_source(1, 3) == 13
+
+
+def test_to_source_before_first_anchor():
+    smap = SourceMap()
+    smap.add(2, 0, 5)
+    assert smap.to_source(1, 0) is None
+
+
+def test_to_source_is_capped_at_anchor_end():
+    smap = SourceMap()
+    smap.add(1, 0, 0, 4)
+    smap.add(2, 0, 5, 8)
+    assert smap.to_source(1, 20) == 4
+
+
+def test_to_source_other_text_line_gives_anchor_offset():
+    smap = SourceMap()
+    smap.add(1, 2, 7, 9)
+    assert smap.to_source(3, 5) == 7
+
+
+def test_to_text_within_source_line():
+    smap = SourceMap()
+    smap.add(1, 0, 0)
+    smap.add(1, 2, 2, 6)
+    assert smap.to_text(4, 0) == (1, 4)
+    assert smap.to_text(9, 0) == (1, 6)
+
+
+def test_to_text_does_not_extrapolate_from_earlier_line():
+    smap = SourceMap()
+    smap.add(1, 0, 0, 20)
+    assert smap.to_text(15, 12) == (1, 0)
+
+
+def test_to_text_empty_map():
+    assert SourceMap().to_text(0, 0) is None
+
+
+def test_shift_moves_later_anchors_on_the_same_line():
+    smap = SourceMap()
+    smap.add(1, 0, 0, 2)
+    smap.add(1, 3, 3, 6)
+    smap.add(2, 0, 7, 9)
+    smap.shift(1, 2, 4)
+    assert smap.to_text(3, 0) == (1, 7)
+    assert smap.to_text(7, 7) == (2, 0)
+
+
+def test_source_position_of_padding_stays_on_its_line():
+    doc, smap = _hr_map()
+    assert smap.source_position(doc, 2, 10) == (2, 0)
+    assert smap.source_position(doc, 1, 50) == (1, 4)
+
+
+def test_source_position_inside_text():
+    doc, smap = _hr_map()
+    assert smap.source_position(doc, 3, 2) == (3, 2)
+
+
+def test_text_position():
+    doc, smap = _hr_map()
+    assert smap.text_position(doc, 1) == (1, 0)
+    assert smap.text_position(doc, 2) == (2, 0)
+    assert smap.text_position(doc, 3, 2) == (3, 2)
+
+
+def test_text_position_clamps_line_and_column():
+    doc, smap = _hr_map()
+    assert smap.text_position(doc, 0) == (1, 0)
+    assert smap.text_position(doc, 99) == (3, 0)
+    assert smap.text_position(doc, 1, 99) == (1, 4)
+
+
+def test_non_bmp_character_takes_two_columns():
+    doc, smap = _emoji_map()
+    assert smap.source_position(doc, 1, 0) == (1, 2)
+    assert smap.source_position(doc, 1, 1) == (1, 2)
+    assert smap.source_position(doc, 1, 3) == (1, 4)
+    assert smap.text_position(doc, 1, 4) == (1, 3)
+    assert smap.text_position(doc, 1, 99) == (1, 8)
+    assert smap.text_position(doc, 2, 2) == (2, 2)
+
+
+def test_add_text_without_utf16_columns():
+    doc = parse_markdown('# 🎉 Title')
+    smap = SourceMap()
+    smap.add_text(1, 0, doc.source, 2, 9)
+    assert len(smap) == 1
+    assert smap.source_position(doc, 1, 2) == (1, 4)
+
+
+@pytest.fixture
+def widget():
+    ctk = pytest.importorskip('customtkinter')
+    try:
+        root = ctk.CTk()
+    except tk.TclError:
+        pytest.skip('no display')
+    from ctk_markdown import CTkMarkdown
+    widget = CTkMarkdown(root)
+    yield widget
+    root.destroy()
+
+
+def test_widget_hr_padding(widget):
+    widget.set_markdown('para\n---\nnext')
+    assert widget.source_position('2.10') == (2, 0)
+    assert widget.source_position('3.2') == (3, 2)
+    assert widget.text_index(3) == '3.0'
+
+
+def test_widget_blockquote_padding(widget):
+    widget.set_markdown('> quote\n\nafter')
+    line, _ = widget.source_position('1.end')
+    assert line == 1
+
+
+def test_widget_inline_markup(widget):
+    widget.set_markdown('Para **bold** tail')
+    assert widget.text_index(1, 7) == '1.5'
+    assert widget.source_position('1.5') == (1, 7)
+
+
+def test_widget_code_lines(widget):
+    widget.set_markdown('```\nx = 1\nprint(x)\n```')
+    index = widget.text_index(3)
+    assert widget.get(index, f'{index} lineend') == 'print(x)'
+    assert widget.source_position(index) == (3, 0)
+
+
+def test_widget_non_bmp_heading(widget):
+    widget.set_markdown('# 🎉 Title\nnext')
+    index = widget.text_index(1, 4)
+    assert widget.get(index) == 'T'
+    assert widget.source_position(index) == (1, 4)